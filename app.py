@@ -1,10 +1,36 @@
-from graph import workflow
-import asyncio
+from graph import run_workflow_sync, start_batch
+from scheduler import Overloaded, INTERACTIVE
+import csv, io, json, os, time
 from state import ApplicantState, CreditState
 from langchain_core.messages import HumanMessage
 import streamlit as st
 from auth_utils import register_user, load_users, verify_password
 
+# Roles allowed to start bulk re-scoring jobs from the UI
+BATCH_ROLES = set(os.getenv("BATCH_ROLES", "underwriter,admin").split(","))
+BATCH_RESULTS_DIR = "batch_results"
+
+def read_batch_applications(uploaded_file):
+    """Lazily yields one credit state per CSV row so large files are never fully loaded into the workflow queue."""
+    for row in csv.DictReader(io.TextIOWrapper(uploaded_file, encoding="utf-8")):
+        # Leave blank cells out so optional fields fall back to their defaults instead of failing validation as ""
+        yield {"applicant": {k: v for k, v in row.items() if v != ""}, "messages": []}
+
+def write_batch_results(path, progress):
+    """Returns an on_result callback appending each batch row's outcome to a JSONL file and counting it in progress, plus the open file."""
+    results_file = open(path, "a")
+
+    def on_result(index, result):
+        if isinstance(result, Exception):
+            progress["failed"] += 1
+            record = {"row": index, "error": str(result)}
+        else:
+            progress["completed"] += 1
+            record = {"row": index, **{k: v for k, v in result.items() if k != "messages"}}
+        results_file.write(json.dumps(record, default=str) + "\n")
+
+    return on_result, results_file
+
 # Set page config
 st.set_page_config(page_title="AI Credit Underwriting Engine", page_icon="🏦", layout="centered")
 
@@ -96,7 +122,11 @@ if "user_role" in st.session_state and st.session_state["user_role"]:
                 ]
             )
             
-            result = asyncio.run(workflow.ainvoke(credit_state.model_dump()))
+            try:
+                result = run_workflow_sync(credit_state.model_dump(), priority=INTERACTIVE, tenant=st.session_state["username"])
+            except Overloaded as e:
+                st.warning(f"⏳ The underwriting engine is busy. Please retry in about {e.retry_after:.0f} seconds.")
+                st.stop()
                         
             st.success("✅ Credit Evaluation Completed")
             st.divider()
@@ -137,6 +167,39 @@ if "user_role" in st.session_state and st.session_state["user_role"]:
             else:
                 st.info("No credit offer generated since the applicant is either not approved or still requires human review.")
     
+    # Bulk re-scoring runs inside this process so it shares the scheduler, and its priorities and budgets, with interactive users
+    if st.session_state["user_role"] in BATCH_ROLES:
+        st.divider()
+        with st.expander("📦 Batch Re-scoring", expanded=False):
+            batch = st.session_state.get("batch")
+
+            if batch and not batch["future"].done():
+                progress = batch["progress"]
+                st.info(f"⏳ Batch running: {progress['completed']} completed, {progress['failed']} failed so far. Results are being written to `{batch['path']}`")
+                col_refresh, col_stop = st.columns(2)
+                col_refresh.button("Refresh", key="batch_refresh_btn")
+                if col_stop.button("Stop Batch", key="batch_stop_btn"):
+                    batch["future"].cancel()
+            else:
+                if batch and batch["future"].cancelled():
+                    st.warning(f"Batch stopped after {batch['progress']['completed']} completed and {batch['progress']['failed']} failed rows. Partial results are in `{batch['path']}`")
+                elif batch and batch["future"].exception():
+                    st.error(f"Batch failed: {batch['future'].exception()}")
+                elif batch:
+                    summary = batch["future"].result()
+                    st.success(f"✅ Batch finished: {summary['completed']} completed, {summary['failed']} failed. Results are in `{batch['path']}`")
+
+                batch_file = st.file_uploader("Applications CSV (one column per applicant field)", type="csv", key="batch_file")
+                if batch_file and st.button("Start Batch", key="batch_start_btn"):
+                    os.makedirs(BATCH_RESULTS_DIR, exist_ok=True)
+                    path = os.path.join(BATCH_RESULTS_DIR, f"{st.session_state['username']}-{int(time.time())}.jsonl")
+                    progress = {"completed": 0, "failed": 0}
+                    on_result, results_file = write_batch_results(path, progress)
+                    future = start_batch(read_batch_applications(batch_file), tenant=st.session_state["username"], on_result=on_result)
+                    future.add_done_callback(lambda _: results_file.close())
+                    st.session_state["batch"] = {"future": future, "path": path, "progress": progress}
+                    st.rerun()
+
 else:
     st.info("Please log in to access the credit application.")
     st.stop() 
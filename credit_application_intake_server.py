@@ -1,4 +1,5 @@
 from fastmcp import FastMCP
+from mcp_transport import run_server
 from state import ApplicantState
 
 mcp = FastMCP(name="Credit Application Intake Server")
@@ -13,4 +14,4 @@ def normalize_application(applicant: ApplicantState) -> dict:
     }
     
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    run_server(mcp)
\ No newline at end of file
@@ -1,4 +1,5 @@
 from fastmcp import FastMCP
+from mcp_transport import run_server
 from state import CreditState
 
 mcp = FastMCP(name="Credit Decision Engine Server")
@@ -14,4 +15,4 @@ def make_decision(credit_state: CreditState) -> dict:
     return {"decision": decision}
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    run_server(mcp)
\ No newline at end of file
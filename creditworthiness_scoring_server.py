@@ -1,4 +1,5 @@
 from fastmcp import FastMCP
+from mcp_transport import run_server
 from state import ApplicantState
 
 mcp = FastMCP(name="Creditworthiness Scoring Server")
@@ -22,5 +23,5 @@ def estimate_creditworthiness(applicant: ApplicantState) -> dict:
     return {"creditworthiness_score": round(creditworthiness_score, 2)}
 
 if __name__ == "__main__":
-    mcp.run()
+    run_server(mcp)
     
\ No newline at end of file
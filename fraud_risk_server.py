@@ -1,5 +1,6 @@
 from state import ApplicantState
 from fastmcp import FastMCP
+from mcp_transport import run_server
 import random, requests
 
 mcp = FastMCP(name="Fraud Risk Evaluation Server")
@@ -18,4 +19,4 @@ def evaluate_fraud_risk(applicant: ApplicantState) -> dict:
     return {"fraud_risk_score": round(fraud_score * 100, 2)}
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    run_server(mcp)
\ No newline at end of file
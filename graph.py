@@ -1,7 +1,10 @@
-import os, asyncio, json, sys
+import os, asyncio, json, sys, threading
 from langgraph.graph import StateGraph, START, END
 from state import CreditState
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp_replicas import load_replica_config, load_balanced_tools
+from scheduler import Scheduler, INTERACTIVE, BATCH
+from typing import Any, Callable, Iterable, Optional
+from concurrent.futures import Future
 from graphviz import Digraph
 
 graph = StateGraph(name="Credit Risk Underwriting Agent", state_schema=CreditState)
@@ -13,73 +16,84 @@ MCP_SERVERS = {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "credit_application_intake_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "check_creditworthiness": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "creditworthiness_scoring_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "analyze_fraud_risk": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "fraud_risk_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "determine_income_stability": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "income_stability_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "evaluate_macroeconomic_risk": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "macroeconomic_risk_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "make_credit_decision": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "credit_decision_engine_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "explain_credit_decision": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "credit_decision_explanation_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "audit_credit_decision": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "credit_decision_audit_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     },
     "offer_credit": {
         "transport": "stdio",
         "command": "python3",
         "args": [os.path.join(BASE_DIR, "credit_offer_server.py")],
-        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, ".."))}
+        "env": {**os.environ, "PYTHONPATH": os.path.abspath(os.path.join(BASE_DIR, "..")), "MCP_TRANSPORT": "stdio"}
     }
 }
 
-mcp_client = MultiServerMCPClient(connections=MCP_SERVERS)
+# Optional replica lists per logical server, e.g. several streamable HTTP offer servers across nodes.
+# Servers without replicas fall back to the stdio child process defined above.
+MCP_REPLICAS = load_replica_config(os.getenv("MCP_REPLICAS_FILE", os.path.join(BASE_DIR, "mcp_replicas.yaml")))
+
+# Servers whose calls can be resent after a timeout or reset without side effects. The LLM-backed explanation,
+# audit and offer servers are left out so a slow replica never causes a duplicate paid call.
+MCP_IDEMPOTENT_SERVERS = {
+    "process_credit_application", "check_creditworthiness", "analyze_fraud_risk",
+    "determine_income_stability", "evaluate_macroeconomic_risk", "make_credit_decision"
+}
 
 print("Attempting to load MCP tools...")
 try:
-    mcp_tools = asyncio.run(mcp_client.get_tools())
-    print(f"Successfully loaded {len(mcp_tools)} tools")
+    tools_map = asyncio.run(load_balanced_tools(MCP_SERVERS, MCP_REPLICAS, MCP_IDEMPOTENT_SERVERS))
+    print(f"Successfully loaded {len(tools_map)} tools")
 except Exception as e:
     print(f"Error loading tools: {e}")
     import traceback
     traceback.print_exc()
     sys.exit(1)
 
-tools_map = {tool.name: tool for tool in mcp_tools}
 print(f"Tools loaded: {list(tools_map.keys())}")
 
+# Admission control and per-dependency budgets shared by every workflow run in this process
+scheduler = Scheduler()
+
 def _parse_result(result):
     # Handle list of content blocks from MCP tools
     if isinstance(result, list):
@@ -112,13 +126,15 @@ async def creditworthiness_node(state: CreditState):
 
 async def fraud_node(state: CreditState):
     tool = tools_map["evaluate_fraud_risk"]
-    result = await tool.ainvoke({"applicant": state.applicant.model_dump()})
+    async with scheduler.dependency("geocoder"):
+        result = await tool.ainvoke({"applicant": state.applicant.model_dump()})
     result = _parse_result(result)
     return {"fraud_risk_score": result["fraud_risk_score"]}
 
 async def macro_node(state: CreditState):
     tool = tools_map["fetch_macro_risk"]
-    result = await tool.ainvoke({"applicant": state.applicant.model_dump()})
+    async with scheduler.dependency("macro"):
+        result = await tool.ainvoke({"applicant": state.applicant.model_dump()})
     result = _parse_result(result)
     return {"market_conditions_score": result["market_conditions_score"]}
 
@@ -136,19 +152,22 @@ async def decision_node(state: CreditState):
 
 async def explanation_node(state: CreditState):
     tool = tools_map["generate_explanation"]
-    result = await tool.ainvoke({"credit_state": state.model_dump()})
+    async with scheduler.dependency("llm"):
+        result = await tool.ainvoke({"credit_state": state.model_dump()})
     result = _parse_result(result)
     return {"explanation": result["explanation"]}
 
 async def audit_node(state: CreditState):
     tool = tools_map["audit_credit_decision"]
-    result = await tool.ainvoke({"credit_state": state.model_dump()})
+    async with scheduler.dependency("llm"):
+        result = await tool.ainvoke({"credit_state": state.model_dump()})
     result = _parse_result(result)
     return {}
 
 async def offer_node(state: CreditState):
     tool = tools_map["make_credit_offer"]
-    result = await tool.ainvoke({"credit_state": state.model_dump()})
+    async with scheduler.dependency("llm"):
+        result = await tool.ainvoke({"credit_state": state.model_dump()})
     result = _parse_result(result)
     return {"credit_offer": result["credit_offer"]}
 
@@ -188,6 +207,39 @@ graph.add_edge("Credit Decision Audit", END)
 # Compile graph
 workflow = graph.compile()
 
+async def run_workflow(credit_state: dict, priority: str = INTERACTIVE, tenant: str = "default") -> dict:
+    """
+        Runs the workflow through the scheduler. Raises scheduler.Overloaded when the priority class queue is full.
+    """
+    return await scheduler.submit(lambda: workflow.ainvoke(credit_state), priority=priority, tenant=tenant)
+
+# A single long-lived event loop so that callers on different threads (e.g. Streamlit sessions) share one scheduler
+_workflow_loop = asyncio.new_event_loop()
+threading.Thread(target=_workflow_loop.run_forever, name="workflow-loop", daemon=True).start()
+
+def run_workflow_sync(credit_state: dict, priority: str = INTERACTIVE, tenant: str = "default") -> dict:
+    return asyncio.run_coroutine_threadsafe(run_workflow(credit_state, priority, tenant), _workflow_loop).result()
+
+async def run_batch(credit_states: Iterable[dict], tenant: str, on_result: Optional[Callable[[int, Any], None]] = None) -> dict:
+    """
+        Re-scores credit states as batch traffic through the scheduler, calling on_result(index, result) as each finishes
+        (result is the exception for failed rows). Returns completed/failed counts.
+    """
+    summary = {"completed": 0, "failed": 0}
+    async for index, result in scheduler.map(workflow.ainvoke, credit_states, tenant=tenant, priority=BATCH):
+        summary["failed" if isinstance(result, Exception) else "completed"] += 1
+        if on_result:
+            on_result(index, result)
+    return summary
+
+def start_batch(credit_states: Iterable[dict], tenant: str, on_result: Optional[Callable[[int, Any], None]] = None) -> Future:
+    """
+        Starts run_batch on the shared workflow loop from any thread and returns immediately. Cancelling the returned
+        future stops the batch. The scheduler's priorities and budgets only hold within one process, so batches must be
+        started from the same process as the interactive UI (see the Batch Re-scoring panel in app.py).
+    """
+    return asyncio.run_coroutine_threadsafe(run_batch(credit_states, tenant, on_result), _workflow_loop)
+
 # Visualize graph
 # Create a new directed graph
 dot = Digraph(comment="Credit Underwriting Workflow", format='png')
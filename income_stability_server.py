@@ -1,4 +1,5 @@
 from fastmcp import FastMCP
+from mcp_transport import run_server
 from state import ApplicantState
 
 mcp = FastMCP(name="Income Stability Evaluation Server")
@@ -10,4 +11,4 @@ def assess_income_stability(applicant: ApplicantState) -> dict:
     return {"income_stability_score": round(income_stability_score, 2)}
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    run_server(mcp)
\ No newline at end of file
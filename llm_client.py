@@ -0,0 +1,250 @@
+import os, time, random, threading, asyncio
+import httpx
+import openai
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from typing import Any, Optional
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+from prompts import estimate_tokens
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point at a local stub (any OpenAI-compatible /v1 endpoint) for testing
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 30.0))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5.0))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 3))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_SECONDS", 60.0))
+OPENAI_RETRY_BASE_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_SECONDS", 0.5))
+OPENAI_RETRY_MAX_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_SECONDS", 8.0))
+
+OPENAI_HTTP_TIMEOUT = httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+# Errors worth retrying: connection failures and timeouts, 429s and 5xx responses
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+# Token buckets matched to the account's requests-per-minute and tokens-per-minute limits. Each LLM server process
+# gets 1/OPENAI_RATE_SHARE of them, so set it to the number of LLM server processes sharing the account
+# (e.g. 10 for eight offer replicas plus the explanation and audit servers)
+OPENAI_RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", 500))
+OPENAI_TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", 200000))
+OPENAI_RATE_SHARE = max(int(os.getenv("OPENAI_RATE_SHARE", 1)), 1)
+OPENAI_BURST = int(os.getenv("OPENAI_BURST", 10))
+# Output tokens reserved per request on top of the prompt estimate, since completions count towards TPM too
+OPENAI_EXPECTED_OUTPUT_TOKENS = int(os.getenv("OPENAI_EXPECTED_OUTPUT_TOKENS", 400))
+
+# Hedging: fire a duplicate request once the primary exceeds this latency percentile (0 disables)
+OPENAI_HEDGE_PERCENTILE = float(os.getenv("OPENAI_HEDGE_PERCENTILE", 95))
+OPENAI_HEDGE_MIN_SAMPLES = int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES", 20))
+OPENAI_HEDGE_INITIAL_DELAY = float(os.getenv("OPENAI_HEDGE_INITIAL_DELAY", 10.0))
+# At most this fraction of recent requests may be hedged
+OPENAI_HEDGE_MAX_FRACTION = float(os.getenv("OPENAI_HEDGE_MAX_FRACTION", 0.05))
+
+http_client = httpx.Client(
+    timeout=OPENAI_HTTP_TIMEOUT,
+    limits=httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_SECONDS
+    )
+)
+
+_executor = ThreadPoolExecutor(max_workers=OPENAI_MAX_CONNECTIONS, thread_name_prefix="llm")
+
+def get_chat_model(temperature: float) -> ChatOpenAI:
+    """
+        Builds a ChatOpenAI on the shared keep-alive connection pool. SDK retries are disabled: HedgedLLM applies the
+        rate limiter and retries each attempt itself, so wrap the model (or its structured output runnable) in one.
+    """
+    return ChatOpenAI(
+        model_name=OPENAI_MODEL,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        temperature=temperature,
+        timeout=OPENAI_HTTP_TIMEOUT,
+        max_retries=0,
+        http_client=http_client
+    )
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float) -> bool:
+        # Requests larger than the bucket are let through once it is full and paid back as debt
+        with self.lock:
+            self._refill()
+            if self.tokens >= min(amount, self.capacity):
+                self.tokens -= amount
+                return True
+            return False
+
+    def acquire(self, amount: float) -> None:
+        while not self.try_acquire(amount):
+            with self.lock:
+                wait_seconds = (min(amount, self.capacity) - self.tokens) / self.rate
+            time.sleep(min(max(wait_seconds, 0.01), 1.0))
+
+    def refund(self, amount: float) -> None:
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """
+        This process's share of the account's RPM and TPM limits, as one token bucket each.
+    """
+    def __init__(self, rpm: float, tpm: float, share: int, burst: int):
+        self.requests = TokenBucket(rpm / share, burst)
+        # Allow bursts of up to ten seconds' worth of tokens
+        self.tokens = TokenBucket(tpm / share, tpm / share / 6)
+
+    def try_acquire(self, tokens: int) -> bool:
+        if not self.requests.try_acquire(1):
+            return False
+        if not self.tokens.try_acquire(tokens):
+            self.requests.refund(1)
+            return False
+        return True
+
+    def acquire(self, tokens: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, OPENAI_RATE_SHARE, OPENAI_BURST)
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+        Jittered exponential backoff, or the server's Retry-After when a 429 or 5xx response provides one.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), OPENAI_RETRY_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return min(OPENAI_RETRY_BASE_SECONDS * 2 ** attempt, OPENAI_RETRY_MAX_SECONDS) * random.uniform(0.5, 1.0)
+
+def estimate_request_tokens(prompt: Any) -> int:
+    messages = prompt if isinstance(prompt, list) else [HumanMessage(content=str(prompt))]
+    return estimate_tokens(messages) + OPENAI_EXPECTED_OUTPUT_TOKENS
+
+class LatencyTracker:
+    def __init__(self, window: int = 500):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(seconds)
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.samples)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        index = min(int(len(samples) * percentile / 100), len(samples) - 1)
+        return samples[index]
+
+class HedgedLLM:
+    """
+        Wraps a chat model (or structured output runnable) with the process's RPM/TPM rate limiter and retries (each
+        attempt, including retries, is charged to the limiter), and fires a duplicate
+        request when the primary is slower than the tracked latency percentile, returning whichever answer arrives first.
+        Hedges are capped at max_fraction of recent requests and skipped when the rate limiter has no tokens to spare,
+        since a losing request cannot be cancelled and still costs a request, tokens and a worker thread.
+    """
+    def __init__(
+        self,
+        runnable: Any,
+        percentile: float = OPENAI_HEDGE_PERCENTILE,
+        min_samples: int = OPENAI_HEDGE_MIN_SAMPLES,
+        initial_delay: float = OPENAI_HEDGE_INITIAL_DELAY,
+        max_fraction: float = OPENAI_HEDGE_MAX_FRACTION,
+        window: int = 500
+    ):
+        self.runnable = runnable
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.max_fraction = max_fraction
+        self.latencies = LatencyTracker(window)
+        # Whether each recent request was hedged
+        self.hedged = deque(maxlen=window)
+        self.hedged_lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.percentile <= 0:
+            return None
+        if self.latencies.count() < self.min_samples:
+            return self.initial_delay
+        return self.latencies.percentile(self.percentile)
+
+    def _invoke_with_retries(self, prompt: Any, cost: int, acquired: bool = False) -> Any:
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            if not acquired:
+                rate_limiter.acquire(cost)
+            acquired = False
+
+            start = time.monotonic()
+            try:
+                result = self.runnable.invoke(prompt)
+            except RETRYABLE_ERRORS as e:
+                if attempt == OPENAI_MAX_RETRIES:
+                    raise
+                time.sleep(retry_delay(e, attempt))
+                continue
+            self.latencies.record(time.monotonic() - start)
+            return result
+
+    def _hedge_allowed(self) -> bool:
+        with self.hedged_lock:
+            return sum(self.hedged) + 1 <= self.max_fraction * (len(self.hedged) + 1)
+
+    def _record(self, hedged: bool) -> None:
+        with self.hedged_lock:
+            self.hedged.append(hedged)
+
+    def invoke(self, prompt: Any) -> Any:
+        cost = estimate_request_tokens(prompt)
+        futures = [_executor.submit(self._invoke_with_retries, prompt, cost)]
+
+        hedged = False
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done and self._hedge_allowed() and rate_limiter.try_acquire(cost):
+                futures.append(_executor.submit(self._invoke_with_retries, prompt, cost, True))
+                hedged = True
+        self._record(hedged)
+
+        first_error = None
+        for future in as_completed(futures):
+            try:
+                return future.result()
+            except Exception as e:
+                first_error = first_error or e
+        raise first_error
+
+    async def ainvoke(self, prompt: Any) -> Any:
+        """
+            Runs invoke in a worker thread so rate limiter waits, retries and hedge delays never block the event loop.
+        """
+        return await asyncio.to_thread(self.invoke, prompt)
@@ -1,5 +1,6 @@
 import os, requests
 from fastmcp import FastMCP
+from mcp_transport import run_server
 from state import ApplicantState
 from dotenv import load_dotenv
 
@@ -39,4 +40,4 @@ def fetch_macro_risk(applicant: ApplicantState) -> dict:
     return {"market_conditions_score": round(macro_score, 2)}
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    run_server(mcp)
\ No newline at end of file
@@ -0,0 +1,172 @@
+import os, time, itertools, asyncio, socket
+import httpx
+import yaml
+from typing import Any, Dict, List, Optional, Set
+from langchain_core.tools import ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+MCP_MAX_RETRIES = int(os.getenv("MCP_MAX_RETRIES", 2))
+MCP_EJECT_SECONDS = float(os.getenv("MCP_EJECT_SECONDS", 30.0))
+
+def load_replica_config(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+        Loads the replica list for each logical MCP server from a YAML file keyed by the MCP_SERVERS names.
+        Entries may be plain URLs of streamable HTTP servers or full connection dicts. Returns {} if the file is missing.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        config = yaml.safe_load(file) or {}
+
+    replicas = {}
+    for server_name, entries in config.items():
+        replicas[server_name] = [
+            {"transport": "streamable_http", "url": entry} if isinstance(entry, str) else entry
+            for entry in entries or []
+        ]
+    return replicas
+
+# Failures that mean the request never reached the replica, so resending it cannot duplicate work
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, ConnectionRefusedError, socket.gaierror)
+
+def was_not_sent(error: BaseException) -> bool:
+    """
+        Checks an error, its causes and any exception group members (the MCP transports raise through anyio task groups)
+        for a connection failure that happened before the request was sent.
+    """
+    if isinstance(error, NOT_SENT_ERRORS):
+        return True
+    if isinstance(error, BaseExceptionGroup) and any(was_not_sent(inner) for inner in error.exceptions):
+        return True
+    cause = error.__cause__ or error.__context__
+    return cause is not None and was_not_sent(cause)
+
+class Replica:
+    def __init__(self, key: str, connection: Dict[str, Any]):
+        self.key = key
+        self.client = MultiServerMCPClient(connections={key: connection})
+        self.tools = None
+        self.in_flight = 0
+        self.ejected_until = 0.0
+
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def eject(self, seconds: float) -> None:
+        self.ejected_until = time.monotonic() + seconds
+
+    async def get_tools(self) -> Dict[str, Any]:
+        if self.tools is None:
+            self.tools = {tool.name: tool for tool in await self.client.get_tools()}
+        return self.tools
+
+class ReplicaPool:
+    """
+        Load balances tool calls for one logical MCP server across its replicas.
+        Picks the healthy replica with the fewest in-flight calls (round-robin on ties). When a call cannot reach a
+        replica, the replica is ejected for eject_seconds and the call is retried on another one. Failures after the
+        request was sent (read timeouts, resets) are only retried for idempotent servers, and never eject, since the
+        replica may just be slow and a resend could duplicate a paid LLM call.
+    """
+    def __init__(self, name: str, connections: List[Dict[str, Any]], idempotent: bool = False, max_retries: int = MCP_MAX_RETRIES, eject_seconds: float = MCP_EJECT_SECONDS):
+        self.name = name
+        self.idempotent = idempotent
+        self.replicas = [Replica(f"{name}#{i}", connection) for i, connection in enumerate(connections)]
+        self.max_retries = max_retries
+        self.eject_seconds = eject_seconds
+        self._counter = itertools.count()
+
+    async def get_tools(self) -> List[str]:
+        """
+            Discovers tool names from every reachable replica. Unreachable replicas are ejected
+            and will be retried once their ejection period expires.
+        """
+        tool_names = set()
+        for replica in self.replicas:
+            try:
+                tool_names.update(await replica.get_tools())
+            except Exception as e:
+                print(f"Replica {replica.key} unavailable: {e}")
+                replica.eject(self.eject_seconds)
+
+        if not tool_names:
+            raise RuntimeError(f"No replica of {self.name} is reachable")
+        return sorted(tool_names)
+
+    def _pick(self, tried: set) -> Optional[Replica]:
+        candidates = [replica for replica in self.replicas if replica not in tried]
+        if not candidates:
+            return None
+
+        healthy = [replica for replica in candidates if replica.is_healthy()]
+        if not healthy:
+            # Every remaining replica is ejected, so try the one that recovers soonest rather than failing outright
+            return min(candidates, key=lambda replica: replica.ejected_until)
+
+        offset = next(self._counter)
+        rotated = healthy[offset % len(healthy):] + healthy[:offset % len(healthy)]
+        return min(rotated, key=lambda replica: replica.in_flight)
+
+    async def ainvoke(self, tool_name: str, args: Dict[str, Any]) -> Any:
+        tried = set()
+        last_error = None
+
+        for _ in range(self.max_retries + 1):
+            replica = self._pick(tried)
+            if replica is None:
+                break
+            tried.add(replica)
+
+            replica.in_flight += 1
+            try:
+                try:
+                    # Listing tools never runs one, so any failure here is safe to retry elsewhere
+                    tools = await replica.get_tools()
+                except Exception as e:
+                    print(f"Replica {replica.key} unavailable: {e}")
+                    replica.eject(self.eject_seconds)
+                    last_error = e
+                    continue
+
+                result = await tools[tool_name].ainvoke(args)
+                replica.ejected_until = 0.0
+                return result
+            except (ToolException, KeyError):
+                # Errors raised by the tool itself are not a replica health problem
+                raise
+            except Exception as e:
+                print(f"Call to {tool_name} on {replica.key} failed: {e}")
+                if was_not_sent(e):
+                    replica.eject(self.eject_seconds)
+                elif not self.idempotent:
+                    raise
+                last_error = e
+            finally:
+                replica.in_flight -= 1
+
+        raise RuntimeError(f"All replicas of {self.name} failed for {tool_name}") from last_error
+
+class BalancedTool:
+    """
+        Stands in for a single MCP tool in graph.py's tools_map, routing each call through its ReplicaPool.
+    """
+    def __init__(self, name: str, pool: ReplicaPool):
+        self.name = name
+        self.pool = pool
+
+    async def ainvoke(self, args: Dict[str, Any]) -> Any:
+        return await self.pool.ainvoke(self.name, args)
+
+async def load_balanced_tools(servers: Dict[str, Dict[str, Any]], replicas: Dict[str, List[Dict[str, Any]]], idempotent_servers: Set[str] = frozenset()) -> Dict[str, BalancedTool]:
+    """
+        Builds a ReplicaPool per logical server, using its configured replicas when present
+        and its default connection otherwise, and returns every tool keyed by name.
+        Calls to idempotent_servers may be resent after a post-send failure.
+    """
+    pools = [
+        ReplicaPool(server_name, replicas.get(server_name) or [connection], idempotent=server_name in idempotent_servers)
+        for server_name, connection in servers.items()
+    ]
+    tool_names = await asyncio.gather(*(pool.get_tools() for pool in pools))
+    return {name: BalancedTool(name, pool) for pool, names in zip(pools, tool_names) for name in names}
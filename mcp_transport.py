@@ -0,0 +1,26 @@
+import argparse, os
+from fastmcp import FastMCP
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_PATH = "/mcp"
+
+def run_server(mcp: FastMCP) -> None:
+    """
+        Runs an MCP server either as a stdio child process (the default used by graph.py)
+        or as a standalone streamable HTTP service so it can be replicated across processes and nodes.
+
+        Settings come from the command line first, then from MCP_TRANSPORT / MCP_HOST / MCP_PORT / MCP_PATH, e.g.
+        python credit_offer_server.py --transport http --port 8109
+    """
+    parser = argparse.ArgumentParser(description=f"Run the {mcp.name}.")
+    parser.add_argument("--transport", choices=["stdio", "http"], default=os.getenv("MCP_TRANSPORT", "stdio"))
+    parser.add_argument("--host", default=os.getenv("MCP_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_PORT", DEFAULT_PORT)))
+    parser.add_argument("--path", default=os.getenv("MCP_PATH", DEFAULT_PATH))
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        mcp.run()
+    else:
+        mcp.run(transport="streamable-http", host=args.host, port=args.port, path=args.path)
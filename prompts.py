@@ -0,0 +1,147 @@
+import logging, sys
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from state import ApplicantState, CreditState
+
+logger = logging.getLogger(__name__)
+
+APPLICANT_PROFILE = (
+    "applicant.name", "applicant.age", "applicant.location", "applicant.employment_status", "applicant.employment_years",
+    "applicant.annual_income", "applicant.total_debt", "applicant.debt_to_income_ratio",
+    "applicant.credit_score", "applicant.credit_history_length"
+)
+RISK_SCORES = ("creditworthiness_score", "fraud_risk_score", "income_stability_score", "market_conditions_score")
+
+def _lookup(data: Dict[str, Any], path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else str(round(value, 3))
+    return str(value)
+
+def render_fields(credit_state: CreditState, fields: Tuple[str, ...]) -> str:
+    """
+        Renders only the requested fields as "name: value" lines in a fixed order, skipping missing and null values.
+    """
+    data = credit_state.model_dump()
+    lines = []
+    for path in fields:
+        value = _lookup(data, path)
+        if value is not None:
+            lines.append(f"{path.split('.')[-1]}: {_format_value(value)}")
+    return "\n".join(lines)
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken missing or its encoding file not cached locally
+        return None
+
+def enable_token_estimate_logging() -> None:
+    """
+        Attaches a stderr handler to this module's logger so PromptSpec.build's token estimates are emitted.
+        stderr keeps them out of the protocol stream of MCP servers on the stdio transport.
+    """
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """
+        Offline estimate of a prompt's input tokens, using tiktoken when available and ~4 characters per token otherwise.
+    """
+    encoding = _encoding()
+    total = 0
+    for message in messages:
+        content = message.content
+        total += 4 + (len(encoding.encode(content)) if encoding else len(content) // 4)
+    return total
+
+class PromptSpec:
+    """
+        A prompt split into a static instruction prefix, sent first so that repeated calls share an identical prefix,
+        and a compact rendering of only the credit state fields the prompt needs. The prefixes are well under OpenAI's
+        1024-token prompt caching minimum, so they are not cached today.
+    """
+    def __init__(self, name: str, instructions: str, fields: Tuple[str, ...]):
+        self.name = name
+        self.instructions = instructions
+        self.fields = fields
+
+    def build(self, credit_state: CreditState) -> List[BaseMessage]:
+        messages = [
+            SystemMessage(content=self.instructions),
+            HumanMessage(content=render_fields(credit_state, self.fields))
+        ]
+        logger.info("%s prompt: ~%d input tokens", self.name, estimate_tokens(messages))
+        return messages
+
+EXPLANATION_PROMPT = PromptSpec(
+    name="explanation",
+    instructions=(
+        "You are a financial credit advisor AI. The user message lists the applicant's profile and computed metrics "
+        "(risk scores are 0-100). Generate a clear, professional, human-readable explanation of the credit decision. "
+        "Do NOT generate the offer here."
+    ),
+    fields=APPLICANT_PROFILE + RISK_SCORES + ("decision",)
+)
+
+AUDIT_PROMPT = PromptSpec(
+    name="audit",
+    instructions=(
+        "You are a financial risk auditing AI. The user message lists the credit decision data.\n"
+        "1. Audit the credit decision carefully.\n"
+        "2. Identify potential issues, inconsistencies, or risk factors.\n"
+        "3. Provide a human-readable audit report summarizing:\n"
+        "- Overall creditworthiness\n"
+        "- Fraud risk\n"
+        "- Income stability\n"
+        "- Market conditions\n"
+        "- Any warnings or flags\n"
+        "Return the audit as plain text only (no JSON or dict)."
+    ),
+    fields=APPLICANT_PROFILE + RISK_SCORES + ("decision", "explanation")
+)
+
+OFFER_PROMPT = PromptSpec(
+    name="offer",
+    instructions=(
+        "You are a financial credit advisor AI. The user message lists the applicant's profile and computed metrics. "
+        "If the decision is APPROVED or SUBJECT TO HUMAN REVIEW, generate a dynamic credit offer including interest rate, "
+        "tenure, and credit limit that is reasonable and risk-adjusted. Return the offer strictly as JSON only in the "
+        "following format: {'interest_rate': <interest_rate>, 'tenure': <tenure>, 'credit_limit': <credit_limit>}. "
+        "Do NOT generate any explanation here."
+    ),
+    fields=(
+        "applicant.age", "applicant.employment_status", "applicant.employment_years", "applicant.annual_income",
+        "applicant.total_debt", "applicant.debt_to_income_ratio", "applicant.credit_score", "applicant.credit_history_length"
+    ) + RISK_SCORES + ("decision",)
+)
+
+if __name__ == "__main__":
+    # Benchmark: compare the compact prompts against the previous repr(model_dump()) payloads
+    credit_state = CreditState(
+        applicant=ApplicantState(
+            name="Alice Johnson", age=32, location="Canada", annual_income=85000, total_debt=15000, credit_score=720,
+            credit_history_length=8, employment_status="employed", employment_years=5, debt_to_income_ratio=15000 / 85000
+        ),
+        messages=[HumanMessage(content="Evaluate this credit application and produce a decision and explanation based on the applicant's profile. Also, generate an optimal offer only if applicant is approved.")],
+        creditworthiness_score=78.4, fraud_risk_score=21.37, income_stability_score=80.0, market_conditions_score=64.25,
+        decision="APPROVED", explanation="The applicant has a strong credit profile with a low debt-to-income ratio."
+    )
+
+    for spec in (EXPLANATION_PROMPT, AUDIT_PROMPT, OFFER_PROMPT):
+        legacy = estimate_tokens([HumanMessage(content=spec.instructions + str(credit_state.model_dump()))])
+        compact = estimate_tokens(spec.build(credit_state))
+        print(f"{spec.name}: legacy ~{legacy} tokens, compact ~{compact} tokens ({compact - legacy:+d})")
@@ -0,0 +1,236 @@
+import os, time, asyncio
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+SCHEDULER_MAX_CONCURRENT = int(os.getenv("SCHEDULER_MAX_CONCURRENT", 32))
+SCHEDULER_MAX_BATCH_CONCURRENT = int(os.getenv("SCHEDULER_MAX_BATCH_CONCURRENT", 16))
+SCHEDULER_INTERACTIVE_QUEUE_LIMIT = int(os.getenv("SCHEDULER_INTERACTIVE_QUEUE_LIMIT", 100))
+SCHEDULER_BATCH_QUEUE_LIMIT = int(os.getenv("SCHEDULER_BATCH_QUEUE_LIMIT", 1000))
+
+# (total concurrency, batch concurrency) per external dependency
+SCHEDULER_DEPENDENCY_LIMITS = {
+    "llm": (int(os.getenv("SCHEDULER_LLM_CONCURRENCY", 16)), int(os.getenv("SCHEDULER_LLM_BATCH_CONCURRENCY", 8))),
+    "geocoder": (int(os.getenv("SCHEDULER_GEOCODER_CONCURRENCY", 2)), int(os.getenv("SCHEDULER_GEOCODER_BATCH_CONCURRENCY", 1))),
+    "macro": (int(os.getenv("SCHEDULER_MACRO_CONCURRENCY", 4)), int(os.getenv("SCHEDULER_MACRO_BATCH_CONCURRENCY", 2)))
+}
+
+# Priority of the workflow run the current task belongs to, set by Scheduler.submit
+current_priority: ContextVar[str] = ContextVar("current_priority", default=INTERACTIVE)
+
+class Overloaded(Exception):
+    """
+        Raised when a request is shed because its priority class queue is full. Callers should retry after retry_after seconds.
+    """
+    def __init__(self, priority: str, retry_after: float):
+        super().__init__(f"The {priority} queue is full, please retry in {retry_after:.0f}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+class PrioritySemaphore:
+    """
+        Concurrency budget for one dependency. Waiting interactive calls are served before batch calls,
+        and batch calls may never hold more than batch_limit slots so interactive traffic always has headroom.
+    """
+    def __init__(self, limit: int, batch_limit: int):
+        self.limit = limit
+        self.batch_limit = min(batch_limit, limit)
+        self.in_use = 0
+        self.batch_in_use = 0
+        self.waiters = {priority: deque() for priority in PRIORITIES}
+
+    def _can_grant(self, priority: str) -> bool:
+        if self.in_use >= self.limit:
+            return False
+        return priority == INTERACTIVE or self.batch_in_use < self.batch_limit
+
+    def _grant(self, priority: str) -> None:
+        self.in_use += 1
+        if priority == BATCH:
+            self.batch_in_use += 1
+
+    def _wake(self) -> None:
+        for priority in PRIORITIES:
+            waiters = self.waiters[priority]
+            while waiters and self._can_grant(priority):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._grant(priority)
+                    waiter.set_result(None)
+
+    async def acquire(self, priority: str) -> None:
+        if not self.waiters[priority] and self._can_grant(priority):
+            self._grant(priority)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(priority)
+            elif waiter in self.waiters[priority]:
+                self.waiters[priority].remove(waiter)
+            raise
+
+    def release(self, priority: str) -> None:
+        self.in_use -= 1
+        if priority == BATCH:
+            self.batch_in_use -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+class Scheduler:
+    """
+        Admission control in front of the workflow. Runs at most max_concurrent jobs (of which at most
+        max_batch_concurrent are batch), always dispatching queued interactive jobs first and rotating
+        round-robin across tenants within a priority class. Submissions beyond a class's queue limit are
+        shed with Overloaded.
+    """
+    def __init__(
+        self,
+        max_concurrent: int = SCHEDULER_MAX_CONCURRENT,
+        max_batch_concurrent: int = SCHEDULER_MAX_BATCH_CONCURRENT,
+        queue_limits: Dict[str, int] = None,
+        dependency_limits: Dict[str, Tuple[int, int]] = None
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_batch_concurrent = min(max_batch_concurrent, max_concurrent)
+        self.queue_limits = queue_limits or {INTERACTIVE: SCHEDULER_INTERACTIVE_QUEUE_LIMIT, BATCH: SCHEDULER_BATCH_QUEUE_LIMIT}
+        self.dependencies = {
+            name: PrioritySemaphore(limit, batch_limit)
+            for name, (limit, batch_limit) in (dependency_limits or SCHEDULER_DEPENDENCY_LIMITS).items()
+        }
+        # Per priority: tenant -> deque of waiting jobs, in round-robin order
+        self.queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self.queued = {priority: 0 for priority in PRIORITIES}
+        self.running = {priority: 0 for priority in PRIORITIES}
+        self.avg_duration = 1.0
+
+    def retry_after(self, priority: str) -> float:
+        backlog = self.queued[priority] + sum(self.running.values())
+        return max(1.0, self.avg_duration * backlog / self.max_concurrent)
+
+    def _can_start(self, priority: str) -> bool:
+        if sum(self.running.values()) >= self.max_concurrent:
+            return False
+        return priority == INTERACTIVE or self.running[BATCH] < self.max_batch_concurrent
+
+    def _dispatch(self) -> None:
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue and self._can_start(priority):
+                tenant, jobs = next(iter(queue.items()))
+                job = jobs.popleft()
+                if jobs:
+                    queue.move_to_end(tenant)
+                else:
+                    del queue[tenant]
+                self.queued[priority] -= 1
+                if not job.done():
+                    self.running[priority] += 1
+                    job.set_result(None)
+
+    def _release(self, priority: str) -> None:
+        self.running[priority] -= 1
+        self._dispatch()
+
+    def _finish(self, priority: str, duration: float) -> None:
+        self.avg_duration = 0.9 * self.avg_duration + 0.1 * duration
+        self._release(priority)
+
+    def _remove(self, priority: str, tenant: str, job: asyncio.Future) -> None:
+        jobs = self.queues[priority].get(tenant)
+        if jobs and job in jobs:
+            jobs.remove(job)
+            self.queued[priority] -= 1
+            if not jobs:
+                del self.queues[priority][tenant]
+
+    async def submit(self, job_fn: Callable[[], Awaitable[Any]], priority: str = INTERACTIVE, tenant: str = "default") -> Any:
+        """
+            Queues job_fn under the given priority class and tenant, runs it once admitted and returns its result.
+            Raises Overloaded immediately if the class's queue is full.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+
+        if self.queued[priority] >= self.queue_limits[priority]:
+            raise Overloaded(priority, self.retry_after(priority))
+
+        job = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(tenant, deque()).append(job)
+        self.queued[priority] += 1
+        self._dispatch()
+
+        try:
+            await job
+        except asyncio.CancelledError:
+            if job.done() and not job.cancelled():
+                # Admitted but never ran, so free the slot without skewing avg_duration
+                self._release(priority)
+            else:
+                self._remove(priority, tenant, job)
+            raise
+
+        token = current_priority.set(priority)
+        start = time.monotonic()
+        try:
+            return await job_fn()
+        finally:
+            current_priority.reset(token)
+            self._finish(priority, time.monotonic() - start)
+
+    def dependency(self, name: str):
+        """
+            Context manager holding one slot of a dependency's concurrency budget at the current job's priority.
+        """
+        return self.dependencies[name].slot(current_priority.get())
+
+    async def map(self, job_fn: Callable[[Any], Awaitable[Any]], items: Iterable[Any], tenant: str, priority: str = BATCH, max_pending: int = 100):
+        """
+            Runs job_fn over a (possibly very large, lazily produced) iterable with at most max_pending submissions
+            outstanding, backing off on Overloaded. Yields (index, result) in completion order; failures are yielded
+            as the exception instead of aborting the batch.
+        """
+        async def run(index: int, item: Any) -> Tuple[int, Any]:
+            while True:
+                try:
+                    return index, await self.submit(lambda: job_fn(item), priority=priority, tenant=tenant)
+                except Overloaded as e:
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    return index, e
+
+        pending = set()
+        try:
+            for index, item in enumerate(items):
+                pending.add(asyncio.ensure_future(run(index, item)))
+                if len(pending) >= max_pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # The consumer stopped early (break, aclose() or cancellation): stop admitting work nobody will read
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)